@@ -1,17 +1,37 @@
+import contextlib
 import dataclasses
 import enum
+import errno
+import hashlib
 import logging
+import mmap
+import os
 import pathlib
+import pickle
+import py_compile
 import re
 import subprocess
 import sys
+import threading
 import time
 import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from string import Template
-from typing import Any, Callable, Generic, TypeVar, ParamSpec
+from typing import Any, Callable, Generic, Iterable, TypeVar, ParamSpec
 
 import cloudpickle
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
 P = ParamSpec('P')
 R = TypeVar('R')
 
@@ -27,6 +47,67 @@ class JobStatus(enum.StrEnum):
     UNKNOWN = enum.auto()
 
 
+_NOT_FINISHED_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.UNKNOWN)
+
+# Statuses fetched from SLURM within the last `_CACHE_TTL` seconds, keyed by job ID
+_STATUS_CACHE: dict[int | str, tuple[float, JobStatus]] = {}
+_CACHE_TTL = 1.0
+
+
+def _parse_status(status_str: str) -> JobStatus:
+    """Map a SLURM job state, e.g., "RUNNING" or "CANCELLED by 1234", to `JobStatus`."""
+    state, *_ = status_str.split() or [""]
+    match state.upper():
+        case "COMPLETED":
+            return JobStatus.COMPLETED
+        case "PENDING":
+            return JobStatus.PENDING
+        case "RUNNING" | "CONFIGURING" | "COMPLETING":
+            return JobStatus.RUNNING
+        case "FAILED":
+            return JobStatus.FAILED
+        case "CANCELLED":
+            return JobStatus.CANCELLED
+        case "TIMEOUT" | "TIME_LIMIT":
+            return JobStatus.TIMEOUT
+        case _:
+            return JobStatus.UNKNOWN
+
+
+def _parse_statuses(output: bytes) -> dict[str, JobStatus]:
+    """
+    Parse "<job_id>|<state>" lines printed by squeue and sacct without decoding the whole output.
+
+    Args:
+        output: Output of squeue or sacct.
+
+    Returns:
+        Mapping from job ID as printed to status.
+    """
+    statuses = {}
+    # only a handful of distinct states appear, so each is mapped once
+    known_states = {}
+    for line in output.split(b'\n'):
+        job_id, sep, state = line.partition(b'|')
+        if not sep:
+            continue
+        status = known_states.get(state)
+        if status is None:
+            status = known_states[state] = _parse_status(state.decode())
+        statuses[job_id.strip().decode()] = status
+    return statuses
+
+
+def _find_by_prefix(root: str | pathlib.Path, prefix: str) -> list[pathlib.Path]:
+    """
+    List files of a job in `root`, whose names are `prefix` followed by "_" or ".", creating `Path` objects only for
+    the matches. The separator keeps, e.g., files of the task "X_10" from matching the prefix "X_1".
+    """
+    starts = (f"{prefix}_", f"{prefix}.")
+    with os.scandir(root) as entries:
+        return [pathlib.Path(entry.path) for entry in entries if entry.name.startswith(starts) and entry.is_file()]
+
+
 @dataclasses.dataclass
 class Job(Generic[R]):
     """
@@ -38,49 +119,191 @@ class Job(Generic[R]):
         root: Directory where job files are stored.
         file_prefix: Prefix for all files related to this job.
         cleanup: Whether to clean up job files after completion.
+        array_index: Index of the task if the job is a task of a job array.
     """
     id: int
     status: JobStatus
     root: str | pathlib.Path
     file_prefix: str
     cleanup: bool = False
+    array_index: int | None = None
+    # Files of this job, known if the job is created by SlurmExecutor
+    _files: list[pathlib.Path] = dataclasses.field(default_factory=list, init=False, repr=False, compare=False)
 
     def get_status(self) -> JobStatus:
         """
-        Get the current status of the job from SLURM.
+        Get the current status of the job. The marker file left by a finished job is checked first, and SLURM is
+        queried only if there is none. Statuses fetched from SLURM within the last `_CACHE_TTL` seconds are reused
+        instead of querying SLURM again.
 
         Returns:
             Current status of the job.
         """
+        status = self._local_status()
+        if status is not None:
+            return status
+
+        cached = _STATUS_CACHE.get(self.slurm_id)
+        if cached is not None and time.monotonic() - cached[0] < _CACHE_TTL:
+            return cached[1]
+        return self.bulk_status([self.slurm_id])[self.slurm_id]
+
+    @property
+    def slurm_id(self) -> int | str:
+        """ID to refer to the job in SLURM commands, i.e., "<id>_<array_index>" for a task of a job array."""
+        return self.id if self.array_index is None else f"{self.id}_{self.array_index}"
+
+    def _local_status(self) -> JobStatus | None:
+        """
+        Get the status of the job from the marker file written at the end of the job. Once the job has finished, its
+        cached SLURM status is no longer needed and is discarded.
+
+        Returns:
+            COMPLETED or FAILED if the job has finished, otherwise None.
+        """
+        if (self.root / f"{self.file_prefix}.done").exists():
+            status = JobStatus.COMPLETED
+        elif (self.root / f"{self.file_prefix}.failed").exists():
+            status = JobStatus.FAILED
+        else:
+            return None
+        _STATUS_CACHE.pop(self.slurm_id, None)
+        return status
+
+    @staticmethod
+    def invalidate_status_cache() -> None:
+        """Discard all cached job statuses."""
+        _STATUS_CACHE.clear()
+
+    @classmethod
+    def bulk_status(cls, ids: list[int | str]) -> dict[int | str, JobStatus]:
+        """
+        Get the current statuses of multiple jobs from SLURM. Jobs still in the queue are answered by a single
+        `squeue` call from the controller's memory, and only the rest are looked up by a single `sacct` call, which
+        queries the accounting database.
+
+        Args:
+            ids: SLURM job IDs, or "<id>_<array_index>" for tasks of job arrays.
+
+        Returns:
+            Mapping from each job ID to its current status.
+        """
+        statuses = dict.fromkeys(ids, JobStatus.UNKNOWN)
+        if not statuses:
+            return statuses
+
+        # -r: one line per task of job arrays
+        found = cls._query_statuses(["squeue", "-h", "-r", "-j", ",".join(map(str, statuses)), "-o", "%i|%T"])
+        missing = [str(job_id) for job_id in statuses if str(job_id) not in found]
+        if missing:
+            # -X: allocations only, -n: no header, -P: "|"-separated
+            found |= cls._query_statuses(["sacct", "-j", ",".join(missing), "-X", "-n", "-P", "-o", "JobID,State"])
+        statuses.update((job_id, found[str(job_id)]) for job_id in statuses if str(job_id) in found)
+
+        now = time.monotonic()
+        # drop expired entries so that the cache does not grow with every job ever queried
+        for job_id, (fetched_at, _) in list(_STATUS_CACHE.items()):
+            if now - fetched_at >= _CACHE_TTL:
+                _STATUS_CACHE.pop(job_id, None)
+        _STATUS_CACHE.update((job_id, (now, status)) for job_id, status in statuses.items())
+        return statuses
+
+    @staticmethod
+    def _query_statuses(command: list[str]) -> dict[str, JobStatus]:
+        """
+        Run a SLURM command printing "<job_id>|<state>" lines and parse its output.
+
+        Args:
+            command: Command to run.
+
+        Returns:
+            Mapping from job ID as printed to status for the jobs found in the output.
+        """
         try:
-            result = subprocess.run(["sacct", "-j", str(self.id), "--format=State", "--noheader", "--parsable2"],
+            result = subprocess.run(command,
                                     check=True,
-                                    capture_output=True,
-                                    text=True
+                                    capture_output=True
                                     )
+        except subprocess.CalledProcessError:
+            # e.g., squeue fails when none of the jobs is in the queue
+            return {}
+        return _parse_statuses(result.stdout)
 
-            # Parse the output to get the job status
-            status_str = result.stdout.strip().split('\n')[0].upper()
-
-            # Map SLURM status to our JobStatus enum
-            match status_str:
-                case "COMPLETED":
-                    return JobStatus.COMPLETED
-                case "PENDING":
-                    return JobStatus.PENDING
-                case "RUNNING":
-                    return JobStatus.RUNNING
-                case "FAILED":
-                    return JobStatus.FAILED
-                case "CANCELLED":
-                    return JobStatus.CANCELLED
-                case "TIMEOUT" | "TIME_LIMIT":
-                    return JobStatus.TIMEOUT
-                case _:
-                    return JobStatus.UNKNOWN
+    @classmethod
+    def wait_all(cls, jobs: list['Job'], interval: float = 60) -> None:
+        """
+        Block until all the given jobs finish. The statuses of the unfinished jobs without marker files are checked
+        together once per polling cycle.
 
-        except subprocess.CalledProcessError:
-            return JobStatus.UNKNOWN
+        Args:
+            jobs: Jobs to wait for.
+            interval: Polling interval in seconds.
+        """
+        pending = [job for job in jobs if job.status in _NOT_FINISHED_STATUSES]
+        while pending:
+            queried = []
+            for job in pending:
+                status = job._local_status()
+                if status is None:
+                    queried.append(job)
+                else:
+                    job.status = status
+
+            statuses = cls.bulk_status([job.slurm_id for job in queried])
+            for job in queried:
+                job.status = statuses[job.slurm_id]
+            pending = [job for job in pending if job.status in _NOT_FINISHED_STATUSES]
+            if pending:
+                time.sleep(interval)
+
+    def wait(self, timeout: float | None = None, interval: float = 60) -> JobStatus:
+        """
+        Block until the job finishes. With `inotify_simple` installed on Linux, this wakes up as soon as the job's
+        marker file is created. SLURM is still queried every `interval` seconds, as file events on network
+        filesystems are not delivered across nodes.
+
+        Args:
+            timeout: Maximum time to wait in seconds. If None, wait until the job finishes.
+            interval: Interval of querying SLURM in seconds.
+
+        Returns:
+            Status of the job, which is not finished yet if timed out.
+        """
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        next_query = now
+        with contextlib.ExitStack() as stack:
+            watcher = None
+            if inotify_simple is not None:
+                try:
+                    watcher = stack.enter_context(inotify_simple.INotify())
+                    watcher.add_watch(self.root, inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO)
+                except OSError:
+                    # e.g., too many inotify instances or watches for this user, so fall back to polling
+                    stack.close()
+                    watcher = None
+
+            while self.status in _NOT_FINISHED_STATUSES:
+                # marker files are cheap to check, while SLURM is queried once per interval
+                status = self._local_status()
+                now = time.monotonic()
+                if status is None and now >= next_query:
+                    status = self.get_status()
+                    next_query = now + interval
+                if status is not None:
+                    self.status = status
+                if self.status not in _NOT_FINISHED_STATUSES:
+                    break
+
+                wait_for = next_query - now if deadline is None else min(next_query, deadline) - now
+                if deadline is not None and wait_for <= 0:
+                    break
+                if watcher is None:
+                    time.sleep(wait_for)
+                else:
+                    # any file event in root wakes this up to check the marker files
+                    watcher.read(timeout=max(int(wait_for * 1000), 1))
+        return self.status
 
     def result(self) -> R:
         """
@@ -93,11 +316,7 @@ class Job(Generic[R]):
             RuntimeError: If the job failed, was cancelled, or timed out.
         """
         # Wait for the job to complete
-        not_finished_statuses = (JobStatus.PENDING, JobStatus.RUNNING, JobStatus.UNKNOWN)
-        while self.status in not_finished_statuses:
-            self.status = self.get_status()
-            if self.status in not_finished_statuses:
-                time.sleep(60)  # Check every 60 seconds
+        self.wait()
 
         try:
             # Check if the job completed successfully
@@ -117,8 +336,9 @@ class Job(Generic[R]):
             if not result_path.exists():
                 raise RuntimeError(f"Job {self.id} completed but no result file was found at {result_path}")
 
-            with open(result_path, 'rb') as f:
-                result = cloudpickle.load(f)
+            # Map the file rather than reading it through buffers, which saves a copy of large results
+            with open(result_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                result = pickle.loads(mm)
 
             return result
         finally:
@@ -129,13 +349,99 @@ class Job(Generic[R]):
     def _cleanup_files(self):
         """Clean up temporary job files."""
         try:
-            # Delete all files with this job's prefix
-            for file in self.root.glob(f"{self.file_prefix}*"):
-                file.unlink()
+            # Delete the known files, or all files with this job's prefix otherwise
+            for file in self._files or _find_by_prefix(self.root, self.file_prefix):
+                file.unlink(missing_ok=True)
         except Exception as e:
             logging.warning(f"Failed to clean up job files: {e}")
 
 
+# Whether `sbatch` has been found on this system, shared among SlurmExecutor instances
+_SLURM_CHECKED: bool | None = None
+
+# Whether files can be created with O_TMPFILE, which is Linux-only and not supported by some filesystems
+_TMPFILE_SUPPORTED = hasattr(os, "O_TMPFILE")
+_TMPFILE_ERRNOS = (errno.EINVAL, errno.EISDIR, errno.EOPNOTSUPP, errno.EXDEV)
+
+# Serialized functions and their file names, kept as long as the functions themselves are alive
+_FUNCTION_CACHE: weakref.WeakKeyDictionary[Callable, tuple[bytes, str]] = weakref.WeakKeyDictionary()
+
+
+def _serialize_function(f: Callable) -> tuple[bytes, str]:
+    """
+    Serialize a function with cloudpickle, compressed with zstd if `zstandard` is installed. The result is reused
+    when the same function object is serialized again.
+
+    Args:
+        f: Function to be serialized.
+
+    Returns:
+        Serialized function and the file name for it, which is derived from its digest.
+    """
+    try:
+        return _FUNCTION_CACHE[f]
+    except (KeyError, TypeError):
+        pass
+
+    blob = cloudpickle.dumps(f)
+    name = f"fn_{hashlib.sha256(blob).hexdigest()}.pkl"
+    if zstandard is not None:
+        # pickled closures are highly compressible, which matters on network filesystems
+        blob = zstandard.ZstdCompressor(level=3).compress(blob)
+        name += ".zst"
+    try:
+        _FUNCTION_CACHE[f] = blob, name
+    except TypeError:
+        # f is not weakly referenceable or hashable, so it cannot be cached
+        pass
+    return blob, name
+
+
+def _serialize_args(args: tuple, kwargs: dict) -> tuple[bytes, list[pickle.PickleBuffer]]:
+    """
+    Serialize function arguments with the standard pickle, which is much faster than cloudpickle for primitive
+    arguments, falling back to cloudpickle for objects that only cloudpickle can handle, e.g., lambdas, classes
+    defined in `__main__` and objects of modules registered by `cloudpickle.register_pickle_by_value`. Both are
+    loadable by `pickle.load` as long as cloudpickle is installed.
+
+    Large buffers supporting pickle protocol 5, e.g., numpy arrays, are kept out of band to avoid copying them into
+    the pickle.
+
+    Returns:
+        Serialized arguments and out-of-band buffers.
+    """
+    buffers = []
+    try:
+        blob = pickle.dumps((args, kwargs), protocol=5, buffer_callback=buffers.append)
+        # objects from __main__ and modules registered by value are pickled by reference, which cannot be resolved
+        # in the job
+        if b"__main__" not in blob and not any(module.encode() in blob
+                                               for module in cloudpickle.list_registry_pickle_by_value()):
+            return blob, buffers
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pass
+    buffers = []
+    return cloudpickle.dumps((args, kwargs), protocol=5, buffer_callback=buffers.append), buffers
+
+
+def _has_editable_import_hooks() -> bool:
+    """
+    Check if `sys.meta_path` has finders of editable installs, which are installed by `.pth` files and thus not by
+    Python started with `-S`. Finders installed by other `.pth` files, e.g., `_distutils_hack` of setuptools, or by
+    imported modules are not needed to import the function and its arguments.
+    """
+    # e.g., __editable___<name>_finder of setuptools, editables.redirector, _<name>_editable of scikit-build-core and
+    # _<name>_editable_loader of meson-python
+    return any("editable" in getattr(finder, "__module__", "").lower() for finder in sys.meta_path)
+
+
+def _write_all(fd: int, data: bytes | memoryview) -> None:
+    """Write all data to a file descriptor."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
 class SlurmExecutor:
     """
     Executor for submitting jobs to a SLURM cluster.
@@ -152,12 +458,19 @@ class SlurmExecutor:
         Initialize a SLURM executor.
 
         Args:
-            root: Directory where job files will be stored.
+            root: Directory where job files will be stored. It must be shared between this node and compute nodes.
             template: Path to the SLURM job template file.
-            slurm_config: Configuration parameters for SLURM jobs.
-            cleanup: Whether to clean up job files after completion.
-            submit_command: If the submission is not simply `sbatch job.sh`, specify it as, e.g., "sbatch -l 1"
-            pyton_path: Path to Python. If None, Python to run slurmit will be used.
+            slurm_config: Configuration parameters for SLURM jobs, substituted into the template. Changes to
+                `self.slurm_config` apply to later submissions.
+            cleanup: Whether to clean up job files after completion. The runner script and the serialized functions
+                are shared among jobs, so they stay in `root` until `cleanup_shared_files` is called.
+            submit_command: If the submission is not simply `sbatch --parsable job.sh`, specify it as, e.g.,
+                "sbatch -l 1"
+            pyton_path: Path to Python. If None, Python to run slurmit will be used, started with `-S -B` to skip
+                `site` initialization and bytecode writing, and the import paths of this process are passed to jobs
+                instead. Import hooks of editable installs, which are installed by `.pth` files, cannot be passed
+                this way, so if any is found in `sys.meta_path`, Python is started with `site` (`-B` only). Set the
+                environment variable `SLURMIT_FULL_PYTHON=1` to always start it with `site`.
         """
 
         self.root = pathlib.Path(root)
@@ -169,6 +482,8 @@ class SlurmExecutor:
 
         # Create root directory if it doesn't exist
         self.root.mkdir(parents=True, exist_ok=True)
+        if self.root.resolve().is_relative_to("/tmp"):
+            logging.warning(f"{self.root} is under /tmp, which is usually not shared with compute nodes")
 
         # Check if template file exists
         template_path = pathlib.Path(template)
@@ -179,120 +494,444 @@ class SlurmExecutor:
         with open(template_path, 'r') as f:
             self.template_content = f.read()
 
-        self.submit_command = ["sbatch"] or submit_command.split(" ")
+        # slurm_config is usually the same for every job, so placeholders are replaced only when it changes
+        self._rendered_config: dict[str, Any] | None = None
+        self._slurm_header = ""
+        self._render_header()
+
+        # Built once, as only the script path differs among submissions
+        self._sbatch_prefix = tuple(submit_command.split()) if submit_command else ("sbatch", "--parsable")
         self.python_path = sys.executable if pyton_path is None else pathlib.Path(pyton_path).resolve()
+        if (pyton_path is None and os.environ.get("SLURMIT_FULL_PYTHON") != "1"
+                and not _has_editable_import_hooks()):
+            # Import paths are only valid for the same Python
+            self._python_options = "-S -B"
+            self._sys_path = [os.path.abspath(path) for path in sys.path]
+        else:
+            self._python_options = "-B"
+            self._sys_path = []
+        self._function_lock = threading.Lock()
+        # files shared among jobs, which are not removed by cleaning up each job
+        self._shared_files: set[pathlib.Path] = set()
+
+        # The bytecode of the runner script is only valid for the same Python
+        self._compile_runner = pyton_path is None
+        self._runner_command: str | None = None
+        self._runner()
 
     @staticmethod
     def _check_slurm_available():
         """
-        Check if SLURM is available on the system.
+        Check if SLURM is available on the system. Once SLURM is found, the check is skipped for the rest of the
+        process.
 
         Raises:
             RuntimeError: If SLURM is not available.
         """
+        global _SLURM_CHECKED
+        if _SLURM_CHECKED:
+            return
+
         try:
             subprocess.run(["sbatch", "--version"], check=True, capture_output=True)
         except (subprocess.SubprocessError, FileNotFoundError):
             raise RuntimeError("SLURM is not available on this system. Make sure 'sbatch' is in your PATH.")
+        _SLURM_CHECKED = True
 
-    def submit(self,
-               f: Callable[P, R],
-               *args: P.args,
-               **kwargs: P.kwargs
-               ) -> Job[R]:
+    @staticmethod
+    def _reset_slurm_check():
+        """Forget the result of `_check_slurm_available`."""
+        global _SLURM_CHECKED
+        _SLURM_CHECKED = None
+
+    @staticmethod
+    def _write_job_files(files: dict[pathlib.Path, bytes | memoryview]) -> None:
         """
-        Submit a function to be executed on the SLURM cluster.
+        Write job files atomically, so that no partially written file is ever visible, e.g., to SLURM. Where
+        supported, each file is written as an unnamed temporary file and then linked to its path, which modifies the
+        directory only once. Otherwise, it is written to a temporary path and renamed.
 
         Args:
-            f: Function to be executed.
-            *args: Positional arguments to pass to the function.
-            **kwargs: Keyword arguments to pass to the function.
+            files: Mapping from paths to their contents.
+        """
+        global _TMPFILE_SUPPORTED
+        for path, data in files.items():
+            if _TMPFILE_SUPPORTED:
+                try:
+                    fd = os.open(path.parent, os.O_TMPFILE | os.O_WRONLY, 0o666)
+                    try:
+                        _write_all(fd, data)
+                        os.link(f"/proc/self/fd/{fd}", path)
+                    finally:
+                        os.close(fd)
+                    continue
+                except FileExistsError:
+                    # linking cannot overwrite, so fall back to renaming
+                    pass
+                except OSError as e:
+                    if e.errno == errno.ENOENT and not path.parent.exists():
+                        # the directory itself is missing, which says nothing about O_TMPFILE support
+                        raise
+                    if e.errno in _TMPFILE_ERRNOS or e.errno == errno.ENOENT:
+                        # the kernel or filesystem does not support O_TMPFILE, or /proc is unavailable
+                        _TMPFILE_SUPPORTED = False
+                    elif e.errno != errno.EPERM:
+                        # EPERM, e.g., hard links are not permitted for this file, only affects this file
+                        raise
+
+            tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            try:
+                _write_all(fd, data)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+
+    def _render_header(self) -> str:
+        """
+        Render the template with `slurm_config`, reusing the previous result unless the configuration has changed.
 
         Returns:
-            A Job object representing the submitted job.
+            The SLURM job script without the command to run.
         """
-        # Generate a unique file prefix for this job
-        file_prefix = f"{time.strftime('%Y%m%d%H%M')}_{uuid.uuid4().hex}"
+        if self._rendered_config != self.slurm_config:
+            self._slurm_header = Template(self.template_content).safe_substitute(**self.slurm_config)
+            self._rendered_config = dict(self.slurm_config)
+        return self._slurm_header
 
-        # Create paths for job files
-        function_path = self.root / f"{file_prefix}_function.pkl"
-        result_path = self.root / f"{file_prefix}_result.pkl"
-        python_script_path = self.root / f"{file_prefix}.py"
-        script_path = self.root / f"{file_prefix}.slurm"
+    def _runner(self) -> str:
+        """
+        Write the runner script unless it has been written, and compile it. Jobs differ only in their files, so a
+        single runner script is shared among them.
+
+        Returns:
+            Command to run the runner script.
+        """
+        if self._runner_command is None:
+            runner = self._runner_script().encode()
+            runner_path = self.root / f"runner_{hashlib.sha256(runner).hexdigest()[:16]}.py"
+            if not runner_path.exists():
+                self._write_job_files({runner_path: runner})
+            self._shared_files.add(runner_path)
+            if self._compile_runner:
+                runner_path = pathlib.Path(py_compile.compile(str(runner_path),
+                                                              cfile=str(runner_path.with_suffix(".pyc")),
+                                                              doraise=True))
+                self._shared_files.add(runner_path)
+            self._runner_command = f"{self.python_path} {self._python_options} {runner_path}"
+        return self._runner_command
+
+    def cleanup_shared_files(self) -> None:
+        """
+        Remove the runner script and the serialized functions written by this executor, which are shared among jobs
+        and thus not removed by cleaning up each job. Call this once the jobs using them have finished. They are
+        written again if jobs are submitted afterward.
+        """
+        with self._function_lock:
+            for file in self._shared_files:
+                file.unlink(missing_ok=True)
+            self._shared_files.clear()
+            self._runner_command = None
+
+    def _save_function(self, f: Callable) -> pathlib.Path:
+        """
+        Serialize a function into `root` unless it is already there.
 
-        # Serialize function and arguments
-        with open(function_path, 'wb') as f_out:
-            cloudpickle.dump((f, args, kwargs), f_out)
+        Args:
+            f: Function to be serialized.
+
+        Returns:
+            Path to the serialized function.
+        """
+        function_blob, function_name = _serialize_function(f)
+        function_path = self.root / function_name
+        with self._function_lock:
+            if not function_path.exists():
+                self._write_job_files({function_path: function_blob})
+            self._shared_files.add(function_path)
+        return function_path
+
+    def _runner_script(self) -> str:
+        """
+        Create a Python script to execute a function, shared among all jobs of this executor. The script takes the
+        file prefix of the job and the file name of the serialized function as its arguments.
+
+        Returns:
+            Content of the script.
+        """
+        return f"""
+import sys
+sys.path[1:1] = {self._sys_path!r}
 
-        # Create a Python script to execute the function
-        python_script = f"""
 import cloudpickle
+import mmap
+import pickle
 import traceback
-import sys
 import os
 
+
+def load_buffer(path):
+    # map out-of-band buffers copy-on-write, so that they are writable without being copied upfront
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return bytearray()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+
+prefix = os.path.join("{self.root}", sys.argv[1])
+function_path = os.path.join("{self.root}", sys.argv[2])
 try:
     # Load function and arguments
-    with open("{function_path}", "rb") as f:
-        func, args, kwargs = cloudpickle.load(f)
+    with open(function_path, "rb") as f:
+        if function_path.endswith(".zst"):
+            import zstandard
+            func = cloudpickle.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+        else:
+            func = cloudpickle.load(f)
+    buffers = []
+    while os.path.exists(f"{{prefix}}_args_{{len(buffers)}}.buf"):
+        buffers.append(load_buffer(f"{{prefix}}_args_{{len(buffers)}}.buf"))
+    with open(f"{{prefix}}_args.pkl", "rb") as f:
+        args, kwargs = pickle.load(f, buffers=buffers)
 
     # Execute function
     result = func(*args, **kwargs)
 
     # Save result
-    with open("{result_path}", "wb") as f:
+    with open(f"{{prefix}}_result.pkl", "wb") as f:
         cloudpickle.dump(result, f)
 
+    # Mark the job as finished
+    open(f"{{prefix}}.done", "w").close()
     sys.exit(0)
 except Exception as e:
-    error_path = "{result_path}.error"
-    with open(error_path, "w") as f:
+    with open(f"{{prefix}}_result.pkl.error", "w") as f:
         f.write(f"Error: {{str(e)}}\\n")
         f.write(traceback.format_exc())
+    open(f"{{prefix}}.failed", "w").close()
     sys.exit(1)
-   
 """
 
-        with open(python_script_path, 'w') as f:
-            f.write(python_script)
-
-        # Create SLURM job script by replacing placeholders in the template
-        template = Template(self.template_content)
-        slurm_script = template.safe_substitute(**self.slurm_config)
-
-        # Add command to execute the Python script
-        slurm_script += f"{self.python_path} {python_script_path}\n"
+    def _sbatch(self, script_path: pathlib.Path, *options: str) -> int:
+        """
+        Submit a SLURM job script.
 
-        # Write SLURM job script to file
-        with open(script_path, 'w') as f:
-            f.write(slurm_script)
+        Args:
+            script_path: Path to the SLURM job script.
+            *options: Additional options to the submit command.
 
-        # Submit job to SLURM
+        Returns:
+            SLURM job ID.
+        """
         try:
-            result = subprocess.run(self.submit_command + [str(script_path)],
+            result = subprocess.run([*self._sbatch_prefix, *options, str(script_path)],
                                     check=True,
                                     capture_output=True,
                                     text=True
                                     )
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to submit job: {e.stderr}")
+
+        # Extract job ID from sbatch output ("<job_id>[;<cluster>]" with --parsable, otherwise usually
+        # "Submitted batch job <job_id>")
+        job_id_match = re.search(r"Submitted batch job (\d+)", result.stdout) or re.match(r"\s*(\d+)", result.stdout)
+
+        if not job_id_match:
+            raise RuntimeError(f"Failed to extract job ID from sbatch output: {result.stdout}")
+
+        try:
+            return int(job_id_match.group(1))
+        except (ValueError, IndexError) as e:
+            raise RuntimeError(f"Failed to parse job ID as integer: {e}")
+
+    @staticmethod
+    def _cancel(jobs: list[Job]) -> None:
+        """
+        Cancel jobs and remove their files. If `scancel` fails, the files are kept as the jobs may still run.
+
+        Args:
+            jobs: Jobs to cancel.
+        """
+        if not jobs:
+            return
+        try:
+            subprocess.run(["scancel", *(str(job.slurm_id) for job in jobs)], check=True, capture_output=True)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logging.warning(f"Failed to cancel jobs {[job.slurm_id for job in jobs]}: {e}")
+            return
+        for job in jobs:
+            job.status = JobStatus.CANCELLED
+            job._cleanup_files()
+
+    def _args_files(self, file_prefix: str, args: tuple, kwargs: dict) -> dict[pathlib.Path, bytes | memoryview]:
+        """
+        Serialize function arguments into "{file_prefix}_args.pkl" and out-of-band buffers into
+        "{file_prefix}_args_{i}.buf".
 
-            # Extract job ID from sbatch output (usually "Submitted batch job <job_id>")
-            job_id_match = re.search(r"Submitted batch job (\d+)", result.stdout)
+        Returns:
+            Mapping from paths to their contents.
+        """
+        blob, buffers = _serialize_args(args, kwargs)
+        files = {self.root / f"{file_prefix}_args.pkl": blob}
+        files.update((self.root / f"{file_prefix}_args_{i}.buf", buffer.raw()) for i, buffer in enumerate(buffers))
+        return files
+
+    def _create_job(self,
+                    job_id: int,
+                    file_prefix: str,
+                    input_files: Iterable[pathlib.Path],
+                    array_index: int | None = None
+                    ) -> Job:
+        """Create a Job object knowing the files it reads and produces."""
+        job = Job(id=job_id,
+                  status=JobStatus.PENDING,
+                  root=self.root,
+                  file_prefix=file_prefix,
+                  cleanup=self.cleanup,
+                  array_index=array_index
+                  )
+        job._files = [*input_files] + [self.root / f"{file_prefix}{suffix}"
+                                       for suffix in ("_result.pkl", "_result.pkl.error", ".done", ".failed")]
+        return job
 
-            if not job_id_match:
-                raise RuntimeError(f"Failed to extract job ID from sbatch output: {result.stdout}")
+    def submit(self,
+               f: Callable[P, R],
+               *args: P.args,
+               **kwargs: P.kwargs
+               ) -> Job[R]:
+        """
+        Submit a function to be executed on the SLURM cluster. The serialized function is stored in `root` and shared
+        among jobs submitting the same function object, so changes to the function's closure after its first
+        submission are not reflected.
 
+        Args:
+            f: Function to be executed.
+            *args: Positional arguments to pass to the function.
+            **kwargs: Keyword arguments to pass to the function.
+
+        Returns:
+            A Job object representing the submitted job.
+        """
+        return self._submit(self._save_function(f), args, kwargs)
+
+    def _submit(self,
+                function_path: pathlib.Path,
+                args: tuple,
+                kwargs: dict
+                ) -> Job:
+        """
+        Submit a job executing an already serialized function.
+
+        Args:
+            function_path: Path to the serialized function.
+            args: Positional arguments to pass to the function.
+            kwargs: Keyword arguments to pass to the function.
+
+        Returns:
+            A Job object representing the submitted job.
+        """
+        # Generate a unique file prefix for this job
+        file_prefix = f"{time.strftime('%Y%m%d%H%M')}_{uuid.uuid4().hex}"
+
+        # Create paths for job files
+        script_path = self.root / f"{file_prefix}.slurm"
+
+        # Create SLURM job script from the rendered template, and add command to execute the runner script
+        slurm_script = self._render_header()
+        slurm_script += f"{self._runner()} {file_prefix} {function_path.name}\n"
+
+        # Write arguments and the script to files
+        files = self._args_files(file_prefix, args, kwargs)
+        files[script_path] = slurm_script.encode()
+        self._write_job_files(files)
+
+        # Submit job to SLURM
+        try:
+            job_id = self._sbatch(script_path)
+        except BaseException:
+            for file in files:
+                file.unlink(missing_ok=True)
+            raise
+        return self._create_job(job_id, file_prefix, files)
+
+    def map(self,
+            f: Callable[..., R],
+            *iterables: Iterable[Any],
+            max_workers: int = 16
+            ) -> list[Job[R]]:
+        """
+        Submit a function for each set of arguments taken from the iterables, like the builtin `map`. Submissions are
+        dispatched concurrently, as each of them mostly waits for `sbatch`. As with `submit`, the serialized function is
+        shared among jobs submitting the same function object, so changes to its closure after its first submission
+        are not reflected.
+
+        Args:
+            f: Function to be executed.
+            *iterables: Iterables yielding positional arguments to pass to the function.
+            max_workers: Maximum number of concurrent submissions.
+
+        Returns:
+            A list of Job objects in the order of the arguments.
+
+        Raises:
+            RuntimeError: If any submission failed, after cancelling the jobs already submitted.
+        """
+        # serialize the function once here rather than concurrently in every worker
+        function_path = self._save_function(f)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(self._submit, function_path, args, {}) for args in zip(*iterables)]
+
+        jobs, errors = [], []
+        for future in futures:
             try:
-                slurm_job_id = int(job_id_match.group(1))
-            except (ValueError, IndexError) as e:
-                raise RuntimeError(f"Failed to parse job ID as integer: {e}")
-
-            # Create and return job object
-            return Job(id=slurm_job_id,
-                       status=JobStatus.PENDING,
-                       root=self.root,
-                       file_prefix=file_prefix,
-                       cleanup=self.cleanup
-                       )
+                jobs.append(future.result())
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            # otherwise, the jobs already submitted would keep running without anyone to collect their results
+            self._cancel(jobs)
+            raise errors[0]
+        return jobs
+
+    def submit_array(self,
+                     f: Callable[..., R],
+                     *iterables: Iterable[Any]
+                     ) -> list[Job[R]]:
+        """
+        Submit a function for each set of arguments taken from the iterables as a single SLURM job array. Unlike `map`,
+        `sbatch` is called only once, and the tasks share one SLURM job script. The number of tasks is limited by
+        `MaxArraySize` of the cluster. As with `submit`, the serialized function is shared among jobs submitting the
+        same function object, so changes to its closure after its first submission are not reflected.
 
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Failed to submit job: {e.stderr}")
+        Args:
+            f: Function to be executed.
+            *iterables: Iterables yielding positional arguments to pass to the function.
+
+        Returns:
+            A list of Job objects, one for each task in the order of the arguments.
+        """
+        arg_sets = list(zip(*iterables))
+        if not arg_sets:
+            return []
+
+        # Generate a unique file prefix for this job array; each task's files are prefixed by "{file_prefix}_{index}"
+        file_prefix = f"{time.strftime('%Y%m%d%H%M')}_{uuid.uuid4().hex}"
+
+        function_path = self._save_function(f)
+        script_path = self.root / f"{file_prefix}.slurm"
+
+        slurm_script = self._render_header()
+        slurm_script += f"{self._runner()} {file_prefix}_${{SLURM_ARRAY_TASK_ID}} {function_path.name}\n"
+
+        task_files = [self._args_files(f"{file_prefix}_{i}", args, {}) for i, args in enumerate(arg_sets)]
+        files = {path: data for task in task_files for path, data in task.items()}
+        files[script_path] = slurm_script.encode()
+        self._write_job_files(files)
+
+        job_id = self._sbatch(script_path, f"--array=0-{len(arg_sets) - 1}")
+        # SLURM copies the job script at submission, so any task may remove it
+        return [self._create_job(job_id, f"{file_prefix}_{i}", [*task, script_path], array_index=i)
+                for i, task in enumerate(task_files)]
@@ -1,13 +1,29 @@
 import os
 import pathlib
+import pickle
 import subprocess
+import sys
 import tempfile
+import threading
+import time
 from unittest import mock
 
 import cloudpickle
 import pytest
 
+import slurmit.core
 from slurmit import JobStatus, Job, SlurmExecutor
+from slurmit.core import _parse_statuses, _serialize_args
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Prevent job statuses and the SLURM check cached by one test from leaking into another."""
+    Job.invalidate_status_cache()
+    SlurmExecutor._reset_slurm_check()
+    yield
+    Job.invalidate_status_cache()
+    SlurmExecutor._reset_slurm_check()
 
 
 @pytest.fixture
@@ -36,9 +52,13 @@ def mock_slurm_commands():
                 result.stdout = "Submitted batch job 12345"
                 return result
 
-            # Mock job status check
+            # Mock job status check; jobs have already left the queue
+            elif command == 'squeue':
+                result.stdout = b""
+                return result
+
             elif command == 'sacct':
-                result.stdout = "COMPLETED\n"
+                result.stdout = b"12345|COMPLETED\n"
                 return result
 
             else:
@@ -69,12 +89,36 @@ def temp_executor(mock_slurm_commands):
         yield executor
 
 
+# kept to run jobs while subprocess.run is mocked
+_subprocess_run = subprocess.run
+
+
+def run_job_command(script_path, **env):
+    """Run the command in a SLURM job script, as a compute node does."""
+    command = pathlib.Path(script_path).read_text().splitlines()[-1]
+    _subprocess_run(["bash", "-c", command], check=True, env=os.environ | env)
+
+
 def test_executor_initialization(temp_executor):
     """Test that SlurmExecutor initializes correctly."""
     assert isinstance(temp_executor.root, pathlib.Path)
     assert temp_executor.slurm_config == {"nodes": 1, "partition": "test"}
 
 
+def test_slurm_check_cached(mock_slurm_commands):
+    """Test that SLURM availability is checked only once per process."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+
+        for _ in range(2):
+            SlurmExecutor(root=temp_dir, template=template_path, slurm_config={})
+
+        version_checks = [call for call in mock_slurm_commands.call_args_list if call[0][0] == ["sbatch", "--version"]]
+        assert len(version_checks) == 1
+
+
 def test_job_submission(temp_executor):
     """Test job submission process."""
 
@@ -89,8 +133,393 @@ def test_job_submission(temp_executor):
     assert job.id == 12345, "Job ID should match mock value"
     # Check that job files were created
     assert (temp_executor.root / f"{job.file_prefix}.slurm").exists()
-    assert (temp_executor.root / f"{job.file_prefix}.py").exists()
-    assert (temp_executor.root / f"{job.file_prefix}_function.pkl").exists()
+    assert not (temp_executor.root / f"{job.file_prefix}.py").exists()
+    runner_path, = temp_executor.root.glob("runner_*.pyc")
+    assert str(runner_path) in (temp_executor.root / f"{job.file_prefix}.slurm").read_text()
+    assert (temp_executor.root / f"{job.file_prefix}_args.pkl").exists()
+    assert len(list(temp_executor.root.glob("fn_*.pkl*"))) == 1
+
+
+def test_sbatch_command(temp_executor, mock_slurm_commands):
+    """Test that the sbatch command line is built once per executor."""
+    sbatch_prefix = temp_executor._sbatch_prefix
+    assert sbatch_prefix == ("sbatch", "--parsable")
+
+    mock_slurm_commands.reset_mock()
+    jobs = [temp_executor.submit(abs, -i) for i in range(100)]
+
+    assert temp_executor._sbatch_prefix is sbatch_prefix
+    for job, call in zip(jobs, mock_slurm_commands.call_args_list):
+        assert call[0][0] == ["sbatch", "--parsable", str(temp_executor.root / f"{job.file_prefix}.slurm")]
+
+    # output of --parsable
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.return_value.stdout = "67890;cluster\n"
+        assert temp_executor.submit(abs, -1).id == 67890
+
+
+def test_submit_command(mock_slurm_commands):
+    """Test submission with a custom command."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+
+        executor = SlurmExecutor(root=temp_dir, template=template_path, slurm_config={},
+                                 submit_command="sbatch -l 1")
+        job = executor.submit(abs, -1)
+
+        assert job.id == 12345
+        assert mock_slurm_commands.call_args[0][0] == ["sbatch", "-l", "1",
+                                                       str(executor.root / f"{job.file_prefix}.slurm")]
+
+
+def test_template_rendered_once(mock_slurm_commands):
+    """Test that the template is rendered at initialization rather than per submission, unless the config changes."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n"
+                    "#SBATCH --partition=$partition\n")
+
+        executor = SlurmExecutor(root=temp_dir,
+                                 template=template_path,
+                                 slurm_config={"partition": "test"})
+
+        with mock.patch('slurmit.core.Template') as mock_template:
+            jobs = [executor.submit(abs, -i) for i in range(10)]
+        mock_template.assert_not_called()
+
+        for job in jobs:
+            slurm_script = (executor.root / f"{job.file_prefix}.slurm").read_text()
+            assert slurm_script.startswith("#!/bin/bash\n#SBATCH --partition=test\n")
+
+        executor.slurm_config["partition"] = "gpu"
+        job = executor.submit(abs, -1)
+        slurm_script = (executor.root / f"{job.file_prefix}.slurm").read_text()
+        assert slurm_script.startswith("#!/bin/bash\n#SBATCH --partition=gpu\n")
+
+
+def test_full_python(mock_slurm_commands, monkeypatch):
+    """Test that SLURMIT_FULL_PYTHON=1 starts Python with site initialization."""
+    monkeypatch.setenv("SLURMIT_FULL_PYTHON", "1")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+
+        executor = SlurmExecutor(root=temp_dir, template=template_path, slurm_config={})
+        job = executor.submit(abs, -1)
+
+        command = (executor.root / f"{job.file_prefix}.slurm").read_text().splitlines()[-1]
+        assert command.startswith(f"{sys.executable} -B {executor.root}/runner_")
+
+
+def test_custom_import_hooks(mock_slurm_commands):
+    """Test that Python starts with site if import hooks of editable installs are installed."""
+
+    class EditableFinder:
+        def find_spec(self, *args, **kwargs):
+            return None
+
+    # as installed by setuptools
+    EditableFinder.__module__ = "__editable___mypkg_0_1_finder"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+
+        with mock.patch('sys.meta_path', [EditableFinder(), *sys.meta_path]):
+            executor = SlurmExecutor(root=temp_dir, template=template_path, slurm_config={})
+        job = executor.submit(abs, -1)
+
+        command = (executor.root / f"{job.file_prefix}.slurm").read_text().splitlines()[-1]
+        assert command.startswith(f"{sys.executable} -B ")
+
+
+def test_custom_python(mock_slurm_commands):
+    """Test that a custom Python runs the runner script from source."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = os.path.join(temp_dir, "template.sh")
+        with open(template_path, 'w') as f:
+            f.write("#!/bin/bash\n")
+
+        executor = SlurmExecutor(root=temp_dir, template=template_path, slurm_config={}, pyton_path=sys.executable)
+        job = executor.submit(abs, -1)
+
+        command = (executor.root / f"{job.file_prefix}.slurm").read_text().splitlines()[-1]
+        runner_path, = executor.root.glob("runner_*.py")
+        assert command.startswith(f"{executor.python_path} -B {runner_path} ")
+        assert not list(executor.root.glob("runner_*.pyc"))
+
+        run_job_command(executor.root / f"{job.file_prefix}.slurm")
+        assert job.result() == 1
+
+
+def test_function_shared_among_jobs(temp_executor):
+    """Test that a function submitted multiple times is serialized into a single file."""
+
+    def add(a, b):
+        return a + b
+
+    job1 = temp_executor.submit(add, 5, 7)
+    with mock.patch.object(SlurmExecutor, '_write_job_files', wraps=SlurmExecutor._write_job_files) as write_spy:
+        job2 = temp_executor.submit(add, 1, 2)
+
+    # all files of the second job are written together, without the function
+    write_spy.assert_called_once()
+    assert {path.name for path in write_spy.call_args[0][0]} == {f"{job2.file_prefix}_args.pkl",
+                                                                 f"{job2.file_prefix}.slurm"}
+
+    assert job1.file_prefix != job2.file_prefix
+    assert len(list(temp_executor.root.glob("fn_*.pkl*"))) == 1
+    assert len(list(temp_executor.root.glob("*_args.pkl"))) == 2
+
+
+def test_function_compression(temp_executor, monkeypatch):
+    """Test that the serialized function is compressed if zstandard is installed."""
+    zstandard = pytest.importorskip("zstandard")
+
+    def add(a, b):
+        return a + b
+
+    temp_executor.submit(add, 5, 7)
+    function_path, = temp_executor.root.glob("fn_*.pkl.zst")
+    with open(function_path, 'rb') as f:
+        assert cloudpickle.loads(zstandard.ZstdDecompressor().decompress(f.read()))(5, 7) == 12
+
+    # without zstandard, the function is stored as is
+    monkeypatch.setattr("slurmit.core.zstandard", None)
+
+    def sub(a, b):
+        return a - b
+
+    temp_executor.submit(sub, 5, 7)
+    function_path, = temp_executor.root.glob("fn_*.pkl")
+    with open(function_path, 'rb') as f:
+        assert cloudpickle.load(f)(5, 7) == -2
+
+
+def test_args_serialization(temp_executor):
+    """Test that primitive arguments are serialized without cloudpickle."""
+
+    def concat(a, b):
+        return a + b
+
+    temp_executor.submit(concat, b"x", b"y")
+
+    with (mock.patch('pickle.dumps', wraps=pickle.dumps) as pickle_spy,
+          mock.patch('cloudpickle.dumps', wraps=cloudpickle.dumps) as cloudpickle_spy):
+        job = temp_executor.submit(concat, b"a" * 1024, b=b"b")
+
+    # the function is already serialized, and the arguments take the fast path
+    pickle_spy.assert_called_once()
+    cloudpickle_spy.assert_not_called()
+    with open(temp_executor.root / f"{job.file_prefix}_args.pkl", 'rb') as f:
+        assert pickle.load(f) == ((b"a" * 1024,), {"b": b"b"})
+
+    # lambdas are not picklable by the standard pickle
+    with mock.patch('cloudpickle.dumps', wraps=cloudpickle.dumps) as cloudpickle_spy:
+        job = temp_executor.submit(concat, lambda: 1, b"b")
+    cloudpickle_spy.assert_called_once()
+    with open(temp_executor.root / f"{job.file_prefix}_args.pkl", 'rb') as f:
+        args, kwargs = pickle.load(f)
+    assert args[0]() == 1
+
+
+def test_args_pickled_by_value(tmp_path, monkeypatch):
+    """Test that arguments from modules registered by value are pickled by cloudpickle."""
+    (tmp_path / "slurmit_test_module.py").write_text("class Point:\n"
+                                                     "    def __init__(self, x):\n"
+                                                     "        self.x = x\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import slurmit_test_module
+
+    cloudpickle.register_pickle_by_value(slurmit_test_module)
+    try:
+        blob, _ = _serialize_args((slurmit_test_module.Point(1),), {})
+    finally:
+        cloudpickle.unregister_pickle_by_value(slurmit_test_module)
+        del sys.modules["slurmit_test_module"]
+
+    # jobs can load the arguments without the module
+    monkeypatch.setattr("sys.path", [path for path in sys.path if path != str(tmp_path)])
+    args, kwargs = pickle.loads(blob)
+    assert args[0].x == 1
+
+
+def test_out_of_band_args(temp_executor):
+    """Test that large buffers are passed to jobs without being copied into the pickle."""
+
+    def total(buffer, offset):
+        view = memoryview(buffer)
+        return len(view) + offset
+
+    data = os.urandom(10 * 1024 * 1024)
+    job = temp_executor.submit(total, pickle.PickleBuffer(data), offset=1)
+
+    buffer_path = temp_executor.root / f"{job.file_prefix}_args_0.buf"
+    assert buffer_path.read_bytes() == data
+    assert (temp_executor.root / f"{job.file_prefix}_args.pkl").stat().st_size < 1024
+    assert buffer_path in job._files
+
+    run_job_command(temp_executor.root / f"{job.file_prefix}.slurm")
+    assert job.result() == len(data) + 1
+
+
+def test_atomic_job_files(temp_executor, monkeypatch):
+    """Test that job files appear only when they are fully written."""
+    if not hasattr(os, "O_TMPFILE"):
+        pytest.skip("O_TMPFILE is not supported")
+
+    link = os.link
+    listings = []
+
+    def link_spy(src, dst, **kwargs):
+        listings.append(set(os.listdir(temp_executor.root)))
+        return link(src, dst, **kwargs)
+
+    monkeypatch.setattr("slurmit.core._TMPFILE_SUPPORTED", True)
+    monkeypatch.setattr("os.link", link_spy)
+    job = temp_executor.submit(abs, -1)
+    if not slurmit.core._TMPFILE_SUPPORTED:
+        pytest.skip("O_TMPFILE is not supported by the filesystem")
+
+    final_listing = set(os.listdir(temp_executor.root))
+    assert listings
+    assert all(listing <= final_listing for listing in listings)
+    assert (temp_executor.root / f"{job.file_prefix}_args.pkl").exists()
+
+
+def test_atomic_job_files_fallback(temp_executor, monkeypatch):
+    """Test writing job files without O_TMPFILE."""
+    monkeypatch.setattr("slurmit.core._TMPFILE_SUPPORTED", False)
+    job = temp_executor.submit(abs, -1)
+
+    assert not [name for name in os.listdir(temp_executor.root) if name.endswith(".tmp")]
+    with open(temp_executor.root / f"{job.file_prefix}_args.pkl", 'rb') as f:
+        assert pickle.load(f) == ((-1,), {})
+
+
+def test_atomic_job_files_missing_root(temp_executor, monkeypatch):
+    """Test that a missing directory does not disable O_TMPFILE."""
+    if not hasattr(os, "O_TMPFILE"):
+        pytest.skip("O_TMPFILE is not supported")
+
+    monkeypatch.setattr("slurmit.core._TMPFILE_SUPPORTED", True)
+    with pytest.raises(FileNotFoundError):
+        temp_executor._write_job_files({temp_executor.root / "missing" / "file": b"data"})
+    assert slurmit.core._TMPFILE_SUPPORTED
+
+    # once /proc is unavailable, every link fails
+    monkeypatch.setattr("os.link", mock.Mock(side_effect=FileNotFoundError(2, "No such file or directory")))
+    temp_executor._write_job_files({temp_executor.root / "file": b"data"})
+    assert not slurmit.core._TMPFILE_SUPPORTED
+    assert (temp_executor.root / "file").read_bytes() == b"data"
+
+
+def test_map(temp_executor, mock_slurm_commands):
+    """Test that multiple submissions are dispatched concurrently."""
+
+    def add(a, b):
+        return a + b
+
+    side_effect = mock_slurm_commands.side_effect
+
+    def slow_side_effect(*args, **kwargs):
+        time.sleep(0.05)
+        return side_effect(*args, **kwargs)
+
+    mock_slurm_commands.side_effect = slow_side_effect
+
+    start = time.perf_counter()
+    with mock.patch('slurmit.core.cloudpickle.dumps', wraps=cloudpickle.dumps) as mock_dumps:
+        jobs = temp_executor.map(add, range(16), range(16))
+    elapsed = time.perf_counter() - start
+
+    # sequential submission would take 0.8 seconds
+    assert elapsed < 0.4
+    assert len(jobs) == 16
+    assert len({job.file_prefix for job in jobs}) == 16
+    assert len(list(temp_executor.root.glob("fn_*.pkl*"))) == 1
+    # the function is pickled once, not once per worker
+    assert [call.args[0] for call in mock_dumps.call_args_list].count(add) == 1
+    for i, job in enumerate(jobs):
+        with open(temp_executor.root / f"{job.file_prefix}_args.pkl", 'rb') as f:
+            assert pickle.load(f) == ((i, i), {})
+
+
+def status_commands(squeue_stdout, sacct_stdout):
+    """Create a side effect of subprocess.run mocking squeue and sacct."""
+
+    def side_effect(*args, **kwargs):
+        result = mock.MagicMock()
+        result.stdout = (squeue_stdout if args[0][0] == "squeue" else sacct_stdout).encode()
+        return result
+
+    return side_effect
+
+
+def test_map_failure(temp_executor, mock_slurm_commands):
+    """Test that jobs already submitted are cancelled if any submission of map fails."""
+    side_effect = mock_slurm_commands.side_effect
+    lock = threading.Lock()
+    job_ids = iter(range(100, 108))
+
+    def failing_side_effect(*args, **kwargs):
+        command = args[0]
+        if command[0] == "sbatch":
+            with lock:
+                job_id = next(job_ids)
+            if job_id == 103:
+                raise subprocess.CalledProcessError(1, command, stderr="sbatch: error: QOSMaxSubmitJobPerUserLimit")
+            result = mock.MagicMock()
+            result.stdout = f"{job_id}\n"
+            return result
+        return side_effect(*args, **kwargs)
+
+    mock_slurm_commands.side_effect = failing_side_effect
+    with pytest.raises(RuntimeError, match="QOSMaxSubmitJobPerUserLimit"):
+        temp_executor.map(abs, range(8))
+
+    scancel_call, = [call for call in mock_slurm_commands.call_args_list if call[0][0][0] == "scancel"]
+    assert sorted(scancel_call[0][0][1:]) == [str(job_id) for job_id in range(100, 108) if job_id != 103]
+    assert not list(temp_executor.root.glob("*.slurm"))
+    assert not list(temp_executor.root.glob("*_args.pkl"))
+
+
+def test_submit_array(temp_executor, mock_slurm_commands):
+    """Test submission of a job array."""
+
+    def add(a, b):
+        return a + b
+
+    mock_slurm_commands.reset_mock()
+    jobs = temp_executor.submit_array(add, range(10), range(10, 20))
+
+    # a single sbatch call for all tasks
+    mock_slurm_commands.assert_called_once()
+    assert "--array=0-9" in mock_slurm_commands.call_args[0][0]
+    assert [job.slurm_id for job in jobs] == [f"12345_{i}" for i in range(10)]
+    assert len(list(temp_executor.root.glob("fn_*.pkl*"))) == 1
+    assert len(list(temp_executor.root.glob("*.slurm"))) == 1
+
+    run_job_command(temp_executor.root / f"{jobs[3].file_prefix.rsplit('_', 1)[0]}.slurm", SLURM_ARRAY_TASK_ID="3")
+    assert jobs[3].get_status() == JobStatus.COMPLETED
+    jobs[3].cleanup = False
+    assert jobs[3].result() == 3 + 13
+
+    # cleaning up tasks removes the shared SLURM script too, but not files of other tasks
+    script_path, = temp_executor.root.glob("*.slurm")
+    assert all(script_path in job._files for job in jobs)
+    jobs[1].cleanup = True
+    (temp_executor.root / f"{jobs[1].file_prefix}.done").touch()
+    with open(temp_executor.root / f"{jobs[1].file_prefix}_result.pkl", 'wb') as f:
+        cloudpickle.dump(None, f)
+    jobs[1].result()
+    assert not script_path.exists()
+    assert (temp_executor.root / f"{jobs[3].file_prefix}_args.pkl").exists()
 
 
 def test_job_status_check():
@@ -101,25 +530,163 @@ def test_job_status_check():
 
     job = Job(id=12345, status=JobStatus.PENDING, root=executor.root, file_prefix="test_job")
 
-    # Mock the subprocess.run call
+    # Mock the subprocess.run call; the job is not in the queue anymore
     with mock.patch('subprocess.run') as mock_run:
-        mock_result = mock.MagicMock()
-        mock_result.stdout = "RUNNING\n"
-        mock_run.return_value = mock_result
+        mock_run.side_effect = status_commands("", "12345|RUNNING\n")
 
         # Check status
         status = job.get_status()
 
-        # Verify correct command was called
-        mock_run.assert_called_once()
-        args = mock_run.call_args[0][0]
-        assert args[0] == "sacct"
-        assert args[1] == "-j"
-        assert args[2] == "12345"
+        # Verify correct commands were called
+        assert mock_run.call_count == 2
+        assert mock_run.call_args_list[0][0][0] == ["squeue", "-h", "-r", "-j", "12345", "-o", "%i|%T"]
+        assert mock_run.call_args_list[1][0][0] == ["sacct", "-j", "12345", "-X", "-n", "-P", "-o", "JobID,State"]
 
         # Check status result
         assert status == JobStatus.RUNNING
 
+        # Back-to-back checks should reuse the cached status
+        assert job.get_status() == JobStatus.RUNNING
+        assert mock_run.call_count == 2
+
+    jobs = [Job(id=job_id, status=JobStatus.PENDING, root=executor.root, file_prefix=f"test_job{job_id}")
+            for job_id in (12345, 12346, 12347)]
+
+    # Statuses of all jobs should be checked with a single sacct call
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.side_effect = status_commands("", "12345|COMPLETED\n12346|CANCELLED by 1000\n12347|FAILED\n")
+
+        Job.wait_all(jobs)
+
+        sacct_calls = [call for call in mock_run.call_args_list if call[0][0][0] == "sacct"]
+        assert len(sacct_calls) == 1
+        args = sacct_calls[0][0][0]
+        assert args[1] == "-j"
+        assert args[2] == "12345,12346,12347"
+        assert [job.status for job in jobs] == [JobStatus.COMPLETED, JobStatus.CANCELLED, JobStatus.FAILED]
+
+
+def test_status_cache_pruned(monkeypatch):
+    """Test that expired and finished entries are removed from the status cache."""
+    root = pathlib.Path(tempfile.mkdtemp())
+    now = time.monotonic()
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.side_effect = status_commands("12345|RUNNING\n12346|RUNNING\n", "")
+        Job.bulk_status([12345, 12346])
+
+        monkeypatch.setattr("time.monotonic", lambda: now + 2 * slurmit.core._CACHE_TTL)
+        mock_run.side_effect = status_commands("12347|RUNNING\n", "")
+        Job.bulk_status([12347])
+    assert set(slurmit.core._STATUS_CACHE) == {12347}
+
+    job = Job(id=12347, status=JobStatus.RUNNING, root=root, file_prefix="test_job")
+    (root / "test_job.done").touch()
+    assert job.get_status() == JobStatus.COMPLETED
+    assert not slurmit.core._STATUS_CACHE
+
+
+def test_job_status_check_queued():
+    """Test that the status of a job in the queue is checked without sacct."""
+    job = Job(id=12345, status=JobStatus.PENDING, root=pathlib.Path(tempfile.mkdtemp()), file_prefix="test_job")
+
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.side_effect = status_commands("12345|RUNNING\n", "12345|COMPLETED\n")
+
+        assert job.get_status() == JobStatus.RUNNING
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0][0] == "squeue"
+
+    # only the jobs that have left the queue are looked up by sacct
+    Job.invalidate_status_cache()
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.side_effect = status_commands("12345|PENDING\n", "12346|COMPLETED\n")
+
+        assert Job.bulk_status([12345, 12346]) == {12345: JobStatus.PENDING, 12346: JobStatus.COMPLETED}
+        assert mock_run.call_args_list[1][0][0][:3] == ["sacct", "-j", "12346"]
+
+    # tasks of job arrays
+    with mock.patch('subprocess.run') as mock_run:
+        mock_run.side_effect = status_commands("12345_1|RUNNING\n12345_2|PENDING\n", "12345_0|COMPLETED\n")
+
+        task = Job(id=12345, status=JobStatus.PENDING, root=job.root, file_prefix="test_job_0", array_index=0)
+        assert task.get_status() == JobStatus.COMPLETED
+        assert Job.bulk_status(["12345_1", "12345_2"]) == {"12345_1": JobStatus.RUNNING, "12345_2": JobStatus.PENDING}
+
+
+def test_job_wait():
+    """Test that waiting wakes up when the marker file is created."""
+    pytest.importorskip("inotify_simple")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        job = Job(id=12345, status=JobStatus.PENDING, root=root, file_prefix="test_job")
+        timer = threading.Timer(0.05, (root / "test_job.done").touch)
+
+        with mock.patch('subprocess.run') as mock_run:
+            mock_run.side_effect = status_commands("12345|RUNNING\n", "")
+            timer.start()
+            start = time.perf_counter()
+            assert job.wait() == JobStatus.COMPLETED
+            elapsed = time.perf_counter() - start
+
+        # SLURM would be queried again after 60 seconds
+        assert elapsed < 0.1 + 0.05
+        assert all(call[0][0][0] != "sacct" for call in mock_run.call_args_list)
+
+
+def test_job_wait_inotify_unavailable():
+    """Test that waiting falls back to polling if inotify instances are exhausted."""
+    pytest.importorskip("inotify_simple")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        job = Job(id=12345, status=JobStatus.PENDING, root=root, file_prefix="test_job")
+        timer = threading.Timer(0.05, (root / "test_job.done").touch)
+
+        with (mock.patch('inotify_simple.INotify', side_effect=OSError(24, "Too many open files")) as mock_inotify,
+              mock.patch('subprocess.run') as mock_run):
+            mock_run.side_effect = status_commands("12345|RUNNING\n", "")
+            timer.start()
+            start = time.perf_counter()
+            assert job.wait(interval=0.01) == JobStatus.COMPLETED
+            elapsed = time.perf_counter() - start
+
+        mock_inotify.assert_called_once()
+        assert elapsed < 0.1 + 0.05
+
+
+def test_job_wait_polling(monkeypatch):
+    """Test waiting without inotify."""
+    monkeypatch.setattr("slurmit.core.inotify_simple", None)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        job = Job(id=12345, status=JobStatus.PENDING, root=root, file_prefix="test_job")
+
+        with mock.patch('subprocess.run') as mock_run:
+            mock_run.side_effect = status_commands("12345|RUNNING\n", "")
+            assert job.wait(timeout=0.05, interval=0.01) == JobStatus.RUNNING
+
+            (root / "test_job.failed").touch()
+            assert job.wait(interval=0.01) == JobStatus.FAILED
+
+
+def test_parse_statuses():
+    """Test parsing of a large squeue/sacct output."""
+    states = ["COMPLETED", "RUNNING", "PENDING", "CANCELLED by 1000"]
+    output = "".join(f"{12345 + i}|{states[i % 4]}\n" for i in range(1000)).encode()
+
+    # the best of several runs, to be robust to noise
+    elapsed = []
+    for _ in range(5):
+        start = time.perf_counter()
+        statuses = _parse_statuses(output)
+        elapsed.append(time.perf_counter() - start)
+
+    assert min(elapsed) < 0.001
+    assert len(statuses) == 1000
+    assert statuses["12345"] == JobStatus.COMPLETED
+    assert statuses["12348"] == JobStatus.CANCELLED
+    assert _parse_statuses(b"12345_0|RUNNING\n12345_[1-9]|PENDING\n") == {"12345_0": JobStatus.RUNNING,
+                                                                         "12345_[1-9]": JobStatus.PENDING}
+
 
 def test_job_result_success():
     """Test successful job result retrieval."""
@@ -132,7 +699,7 @@ def test_job_result_success():
                     "#SBATCH --partition={partition}\n")
 
         with mock.patch.object(SlurmExecutor, "_check_slurm_available", return_value=None):
-            # because there's no sbatch
+            # because there's no sbatch; without import hooks of editable installs, jobs start without site
             executor = SlurmExecutor(root=temp_dir,
                                      template=template_path,
                                      slurm_config={"nodes": 1, "partition": "test"})
@@ -147,13 +714,16 @@ def test_job_result_success():
             mock_run.side_effect = side_effect
             # create and run a python script and raise an error because sbatch is not found
             job = executor.submit(lambda: result_value)
-        subprocess.run(["python", str(job.root / f"{job.file_prefix}.py")], check=True)
+        assert f"{sys.executable} -S -B" in (job.root / f"{job.file_prefix}.slurm").read_text()
+        # without site, imports rely on the paths passed from this process
+        run_job_command(job.root / f"{job.file_prefix}.slurm")
         print(f">>>{list(job.root.iterdir())}")
+        assert (job.root / f"{job.file_prefix}.done").exists()
 
         with mock.patch('subprocess.run') as mock_run:
             def side_effect(*args, **kwargs):
                 result = mock.MagicMock()
-                result.stdout = "COMPLETED\n"
+                result.stdout = b"12345|COMPLETED\n"
                 return result
 
             mock_run.side_effect = side_effect
@@ -162,6 +732,18 @@ def test_job_result_success():
             assert job.result() == result_value
 
 
+def test_job_result_large():
+    """Test retrieval of a large result."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        job = Job(id=12345, status=JobStatus.COMPLETED, root=root, file_prefix="test_job")
+        result_value = os.urandom(10 * 1024 * 1024)
+        with open(root / "test_job_result.pkl", 'wb') as f:
+            cloudpickle.dump(result_value, f)
+
+        assert job.result() == result_value
+
+
 def test_job_result_failure(mock_slurm_commands):
     """Test handling of failed job."""
     # Create temporary directory
@@ -188,7 +770,7 @@ def test_job_result_failure(mock_slurm_commands):
         assert "Test error message" in error_str
 
 
-def test_cleanup_files(temp_executor):
+def test_cleanup_files(temp_executor, mock_slurm_commands):
     """Test cleanup of job files."""
     # Submit a test job
     job = temp_executor.submit(lambda: None)
@@ -202,12 +784,52 @@ def test_cleanup_files(temp_executor):
     with open(result_path, 'wb') as f:
         cloudpickle.dump(None, f)
 
-    # Mock get_status to return COMPLETED
-    with mock.patch.object(job, 'get_status', return_value=JobStatus.COMPLETED):
-        # Get result with cleanup
-        temp_executor.cleanup = True
+    # Mark the job as finished, as the job script does
+    (temp_executor.root / f"{job.file_prefix}.done").touch()
+    mock_slurm_commands.reset_mock()
+
+    # Get result with cleanup, which removes the known files without scanning the directory
+    temp_executor.cleanup = True
+    with mock.patch.object(pathlib.Path, 'glob') as mock_glob:
+        job.result()
+    mock_glob.assert_not_called()
+
+    # The status should be read from the marker without SLURM
+    mock_slurm_commands.assert_not_called()
+
+    # Check that files were removed
+    remaining_files = list(temp_executor.root.glob(f"{job.file_prefix}*"))
+    assert len(remaining_files) == 0
+
+
+def test_cleanup_files_without_file_list():
+    """Test cleanup of files of a job not created by SlurmExecutor."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = pathlib.Path(temp_dir)
+        job = Job(id=12345, status=JobStatus.COMPLETED, root=root, file_prefix="test_job", cleanup=True)
+        for name in ("test_job.slurm", "test_job_args.pkl", "test_job.done", "other_job.slurm", "test_job0_args.pkl"):
+            (root / name).touch()
+        with open(root / "test_job_result.pkl", 'wb') as f:
+            cloudpickle.dump(None, f)
+
         job.result()
 
-        # Check that files were removed
-        remaining_files = list(temp_executor.root.glob(f"{job.file_prefix}*"))
-        assert len(remaining_files) == 0
+        assert sorted(path.name for path in root.iterdir()) == ["other_job.slurm", "test_job0_args.pkl"]
+
+
+def test_cleanup_shared_files(temp_executor):
+    """Test that the runner script and serialized functions are removed on request, and written again if needed."""
+    jobs = [temp_executor.submit(lambda i=i: i) for i in range(3)]
+    assert len(list(temp_executor.root.glob("fn_*.pkl*"))) == 3
+
+    temp_executor.cleanup_shared_files()
+    assert not list(temp_executor.root.glob("fn_*.pkl*"))
+    assert not list(temp_executor.root.glob("runner_*"))
+    assert (temp_executor.root / "template.sh").exists()
+    assert all((temp_executor.root / f"{job.file_prefix}.slurm").exists() for job in jobs)
+
+    job = temp_executor.submit(abs, -1)
+    runner_path, = temp_executor.root.glob("runner_*.pyc")
+    assert str(runner_path) in (temp_executor.root / f"{job.file_prefix}.slurm").read_text()
+    run_job_command(temp_executor.root / f"{job.file_prefix}.slurm")
+    assert job.result() == 1